@@ -1,53 +1,259 @@
 import streamlit as st
-from google import genai
-from google.genai import types
-import PIL.Image
-from pydantic import BaseModel
+import gc
 import json
+import hashlib
+import html
+import io
+import itertools
+import pathlib
+import re
 import urllib.parse # NEW: Required for making share links
+from schemas import DECODERS, JSON_SCHEMAS
 
 # --- 1. PAGE CONFIG & CUSTOM CSS (Minimalist Styling) ---
 st.set_page_config(page_title="NutriScan AI", page_icon="🍏", layout="centered")
 
-st.markdown("""
-<style>
-    .main-title {
-        text-align: center;
-        color: #2E7D32;
-        font-family: 'Helvetica Neue', sans-serif;
-    }
-    .sub-title {
-        text-align: center;
-        color: #666;
-        margin-bottom: 2rem;
-        font-size: 1.1rem;
-    }
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-</style>
-""", unsafe_allow_html=True)
-
-# --- 2. THE BLUEPRINT ---
-class BadIngredient(BaseModel):
-    name: str
-    explanation: str
-
-class FoodAnalysis(BaseModel):
-    product_identified: str
-    health_rating: int
-    verdict: str
-    psychological_insights: list[str] 
-    bad_ingredients: list[BadIngredient]
-    good_ingredients: list[str]
-    healthy_replacements: list[str]
-
-# --- 3. THE FRONTEND UI ---
+@st.cache_resource
+def load_css() -> str:
+    # Read the stylesheet once per process instead of rebuilding it on every rerun
+    return f"<style>{pathlib.Path(__file__).with_name('style.css').read_text()}</style>"
+
+# Style-only st.html goes to the event container: no markdown parsing, no empty block in the layout.
+# It still has to be sent each run, since Streamlit drops elements a rerun doesn't re-emit.
+st.html(load_css())
+
+# --- 2. THE PROMPT (the response blueprints live in schemas.py) ---
+MODEL = "gemini-2.5-flash"  # Part of the scan cache key, so switching models never serves stale answers
+
+# Static instructions go in system_instruction, ahead of the image. Gemini's implicit context
+# cache only discounts an identical prefix above its minimum size, so the rubric and worked
+# examples below are deliberately spelled out in full and must stay byte-for-byte stable.
+# Keep it above 1,024 tokens too: that is also the floor for the explicit cache further down.
+SYSTEM_PROMPT = """
+You are a strict, concise nutritionist. The user sends one photo of a food product, usually
+its ingredient list and sometimes its nutrition facts panel or the front of the pack.
+Analyze the ingredients in that image and fill in every field of the JSON response.
+
+GENERAL RULES
+- Base the analysis on what is printed in the image. Use common knowledge about a
+  recognised product only to fill small gaps, never to invent ingredients.
+- Write for a busy shopper reading on a phone: plain words, no jargon, no hedging.
+- If the label is partly unreadable, analyze what you can read and stay conservative.
+- If the image is not a food or drink label at all, set 'product_identified' to
+  'Unknown product', 'health_rating' to 0, 'verdict' to 'Not a label', and leave the lists
+  empty except for one 'psychological_insights' entry asking for a clearer photo.
+
+FIELD GUIDE
+1. 'product_identified': the product name as printed (brand + product), or a short
+   description such as 'Chocolate sandwich cookies' when no name is visible.
+2. 'health_rating': an integer from 0 to 10.
+   - 9-10: whole foods, one or a few recognisable ingredients, no added sugar.
+   - 7-8: minimally processed, small amounts of salt, sugar or oil.
+   - 4-6: processed, with refined flours, added sugar or a few additives.
+   - 1-3: ultra-processed, sugar or refined oils near the top of the list, several
+     additives such as colours, flavour enhancers, emulsifiers or sweeteners.
+   - 0: only for unreadable or non-food images.
+3. 'verdict': ONE OR TWO WORDS max (e.g., 'Highly Processed', 'Healthy', 'Avoid',
+   'Occasional Treat', 'Good Choice'). It must agree with the health_rating.
+4. 'psychological_insights': exactly 2 short lines that shock or inform the user
+   (e.g., 'Equivalent to 5 teaspoons of sugar', 'Contains 3 high-risk additives').
+   Prefer concrete numbers you can derive from the label over vague warnings.
+5. 'bad_ingredient_names' and 'bad_ingredient_explanations': two parallel lists of the
+   same length, one entry per ingredient worth worrying about, most harmful first.
+   Each name is the ingredient as printed (include the E-number if shown). The
+   explanation at the same position is ONE short, simple sentence that a 10-year-old
+   would understand.
+   Typical red flags: added sugars and syrups, hydrogenated or refined seed oils,
+   artificial colours, artificial sweeteners, flavour enhancers, preservatives such as
+   nitrites, and large amounts of salt. Leave both lists empty if nothing qualifies.
+6. 'good_ingredients': ingredients that genuinely add nutrition (whole grains, nuts,
+   seeds, legumes, fruit, vegetables, protein sources, fibre). Short names only.
+7. 'healthy_replacements': 2-3 healthier, whole-food alternatives the user could buy or
+   make instead, each a short phrase.
+
+WORKED EXAMPLE
+Label text: 'Ingredients: Sugar, wheat flour, palm oil, cocoa powder (5%), glucose
+syrup, emulsifier (soy lecithin), salt, raising agent (sodium bicarbonate), flavouring.'
+Response:
+{"product_identified": "Chocolate sandwich cookies", "health_rating": 2,
+ "verdict": "Avoid", "psychological_insights": ["Sugar is the very first ingredient",
+ "Two kinds of added sugar in one cookie"],
+ "bad_ingredient_names": ["Sugar", "Palm oil", "Glucose syrup"],
+ "bad_ingredient_explanations": ["It is the main ingredient, so each cookie is mostly sweetener.",
+ "A cheap fat that is not good for your heart.", "Another sugar hidden under a different name."],
+ "good_ingredients": ["Cocoa powder"], "healthy_replacements": ["Oat and banana cookies",
+ "Dark chocolate (85%) with almonds", "Whole-grain crackers with nut butter"]}
+
+WORKED EXAMPLE
+Label text: 'Ingredients: Whole grain oats (60%), honey, sunflower oil, almonds (8%), dried
+apricots (5%) (apricots, rice flour, preservative: sulphur dioxide), salt, natural flavouring.'
+Response:
+{"product_identified": "Honey almond granola", "health_rating": 6,
+ "verdict": "Occasional Treat", "psychological_insights": ["Honey is the second ingredient",
+ "A 45g bowl carries about 3 teaspoons of added sugar"],
+ "bad_ingredient_names": ["Honey", "Sulphur dioxide (E220)"],
+ "bad_ingredient_explanations": ["It is still sugar, even though it sounds natural.",
+ "A preservative that can bother people with asthma."],
+ "good_ingredients": ["Whole grain oats", "Almonds", "Dried apricots"],
+ "healthy_replacements": ["Plain rolled oats with fresh fruit", "Unsweetened muesli",
+ "Greek yoghurt with nuts and berries"]}
+
+WORKED EXAMPLE
+Label text: 'Ingredients: Chickpeas (70%), tahini (sesame seed paste) (15%), water, lemon
+juice, extra virgin olive oil, garlic, sea salt.'
+Response:
+{"product_identified": "Classic hummus", "health_rating": 9, "verdict": "Good Choice",
+ "psychological_insights": ["Seven ingredients, all of them real food",
+ "No added sugar and no additives"], "bad_ingredient_names": [],
+ "bad_ingredient_explanations": [], "good_ingredients": ["Chickpeas", "Tahini",
+ "Extra virgin olive oil", "Lemon juice", "Garlic"],
+ "healthy_replacements": ["Homemade hummus with less salt", "Carrot and cucumber sticks to dip",
+ "Whole-grain pitta instead of white"]}
+"""
+
+# --- 3. THE AI BRAIN (cached, so re-scanning the same label is instant) ---
+# google.genai and PIL are imported inside the functions that need them, so a cold
+# start can paint the upload screen before paying for their (heavy) imports.
+@st.cache_resource
+def get_genai_client(api_key: str):
+    # One client per process: keeps the HTTP connection pool warm across reruns
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+MAX_IMAGE_EDGE = 1024  # Labels stay readable at this size, phone photos are 4000px+
+JPEG_QUALITY = 85
+
+@st.cache_data(ttl=24 * 60 * 60, max_entries=256, show_spinner=False)  # Retries / other prompts skip the resize
+def shrink_image(image_hash: str, _image_bytes: bytes, mime_type: str) -> tuple[bytes, str]:
+    import PIL.Image
+    import PIL.ImageOps
+    img = PIL.Image.open(io.BytesIO(_image_bytes))  # Lazy: only the header is read here
+    if max(img.size) <= MAX_IMAGE_EDGE:
+        return _image_bytes, mime_type  # Already small: upload the original bytes, no decode/re-encode
+    img.draft("RGB", (MAX_IMAGE_EDGE, MAX_IMAGE_EDGE))  # JPEGs: libjpeg decodes at 1/2-1/8 scale, not full 12MP
+    img = PIL.ImageOps.exif_transpose(img)  # Keep phone photos upright once EXIF is dropped
+    img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), PIL.Image.LANCZOS)
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=JPEG_QUALITY)
+    return buf.getvalue(), "image/jpeg"
+
+# Pulls finished fields out of the half-streamed JSON (a string counts once its closing quote lands)
+STREAM_FIELDS = {
+    "product_identified": re.compile(r'"product_identified"\s*:\s*("(?:[^"\\]|\\.)*")'),
+    "health_rating": re.compile(r'"health_rating"\s*:\s*(-?\d+)\s*[,}]'),
+    "verdict": re.compile(r'"verdict"\s*:\s*("(?:[^"\\]|\\.)*")'),
+}
+
+def progress_label(partial_json: str):
+    found = {}
+    for field, pattern in STREAM_FIELDS.items():
+        match = pattern.search(partial_json)
+        if match:
+            found[field] = json.loads(match.group(1))
+    if "product_identified" not in found:
+        return None
+    label = f"🔍 Found {found['product_identified']}!"
+    if "health_rating" in found:
+        label += f" Score: {found['health_rating']}/10"
+    if "verdict" in found:
+        label += f" ({found['verdict']})"
+    return label + " Reading the ingredients..."
+
+PROMPT_CACHE_TTL = 60 * 60  # Seconds Gemini keeps the explicit prompt cache alive
+
+@st.cache_resource
+def get_schema_content(schema_name: str):
+    # The response schema as a user turn ahead of the image. It rides in the CachedContent
+    # (headroom over the 1,024-token minimum) or inline, so the model sees it either way.
+    from google.genai import types
+    schema = json.dumps(JSON_SCHEMAS[schema_name], indent=1)
+    return types.Content(role="user", parts=[types.Part.from_text(text=f"Response JSON schema:\n{schema}")])
+
+@st.cache_resource(ttl=PROMPT_CACHE_TTL - 5 * 60)  # Let go of the handle a bit before Gemini expires it
+def get_cached_prompt(_client, system_prompt: str, schema_name: str, model: str):
+    # Explicit CachedContent holding the system prompt and schema, referenced by name on every scan
+    from google.genai import errors, types
+    try:
+        cache = _client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                contents=[get_schema_content(schema_name)],
+                ttl=f"{PROMPT_CACHE_TTL}s",
+            ),
+        )
+    except errors.ClientError as e:
+        if e.code == 400:
+            return None  # Rejected outright (e.g. too small): memoized, so send the prompt inline this window
+        raise  # Quota / auth / network trouble is not memoized, the next scan tries again
+    return cache.name
+
+# Bounded: the CachedContent name rotates every window, and stale names are never asked for again
+@st.cache_resource(max_entries=8)
+def get_generation_config(schema_name: str, system_prompt: str, cached_prompt=None):
+    # Built once per process: app.py re-executes on every rerun, so a plain module-level
+    # constant would still be rebuilt each interaction
+    from google.genai import types
+    if cached_prompt:
+        # Gemini rejects system_instruction alongside cached_content, the cache already carries it
+        return types.GenerateContentConfig(
+            cached_content=cached_prompt,
+            response_mime_type="application/json",
+            response_json_schema=JSON_SCHEMAS[schema_name],
+        )
+    return types.GenerateContentConfig(
+        system_instruction=system_prompt,
+        response_mime_type="application/json",
+        response_json_schema=JSON_SCHEMAS[schema_name],
+    )
+
+def stream_json(client, model: str, contents: list, config, on_progress=None) -> str:
+    # Stream so the UI can react before the full JSON lands. on_progress must only
+    # call status.update(): regular st.* elements here would be replayed on cache hits.
+    text = ""
+    for chunk in client.models.generate_content_stream(model=model, contents=contents, config=config):
+        text += chunk.text or ""
+        if on_progress is not None:
+            on_progress(text)
+    return text
+
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def analyze_image(_client, image_hash: str, _image_bytes: bytes, mime_type: str, system_prompt: str, schema_name: str, model: str, _on_progress=None):
+    # Keyed on the precomputed image_hash: the underscore keeps Streamlit from re-hashing
+    # the (multi-MB) upload bytes itself on every call
+    from google.genai import errors, types
+    payload, mime_type = shrink_image(image_hash, _image_bytes, mime_type)
+    image = types.Content(role="user", parts=[types.Part.from_bytes(data=payload, mime_type=mime_type)])
+    inline = [get_schema_content(schema_name), image]  # What the CachedContent + image amount to
+    try:
+        cached_prompt = get_cached_prompt(_client, system_prompt, schema_name, model)
+    except Exception:
+        cached_prompt = None  # Couldn't create it right now: this scan sends the prompt inline
+    try:
+        contents = [image] if cached_prompt else inline
+        text = stream_json(_client, model, contents, get_generation_config(schema_name, system_prompt, cached_prompt), _on_progress)
+    except errors.ClientError as e:
+        # Only a missing/expired cache is worth retrying; a 429 et al. goes straight to the user
+        if cached_prompt is None or e.code not in (403, 404):
+            raise
+        # The prompt cache expired or was evicted early: forget it and retry with the prompt inline
+        get_cached_prompt.clear()
+        text = stream_json(_client, model, inline, get_generation_config(schema_name, system_prompt), _on_progress)
+    # One msgspec pass parses + validates, so a stringy health_rating can't crash the UI
+    return DECODERS[schema_name].decode(text)
+
+# --- 4. THE FRONTEND UI ---
 st.markdown("<h1 class='main-title'>🍏 NutriScan AI</h1>", unsafe_allow_html=True)
 st.markdown("<p class='sub-title'>Snap a photo or upload an ingredient label to decode what you are really eating.</p>", unsafe_allow_html=True)
 
-try:
-    api_key = st.secrets["GEMINI_API_KEY"]
-except KeyError:
+@st.cache_resource
+def _load_key():
+    # One secrets lookup per process instead of a lookup + KeyError path on every rerun
+    return st.secrets.get("GEMINI_API_KEY")
+
+api_key = _load_key()
+if not api_key:
+    _load_key.clear()  # Don't pin the missing key, pick it up as soon as it's added
     st.error("🔒 App is locked. Please add your API Key to Streamlit Secrets.")
     st.stop()
 
@@ -59,106 +265,125 @@ with tab_upload:
 with tab_camera:
     camera_photo = st.camera_input("Take a picture of the ingredients")
 
-image_to_process = uploaded_file if uploaded_file is not None else camera_photo
+# --- 5. THE LOGIC & DISPLAY ---
+# Health score (0-10) -> verdict box colour: 0-3 red, 4-6 amber, 7-10 green
+VERDICT_TIERS = (st.error,) * 4 + (st.warning,) * 3 + (st.success,) * 4
 
-# --- 4. THE LOGIC & DISPLAY ---
-if image_to_process is not None:
-    client = genai.Client(api_key=api_key)
-    img = PIL.Image.open(image_to_process)
-    
-    prompt = """
-    You are a strict, concise nutritionist. Analyze the ingredients in this image.
-    1. Keep the 'verdict' to ONE OR TWO WORDS max (e.g., 'Highly Processed', 'Healthy', 'Avoid').
-    2. Provide 2 short 'psychological_insights' to shock or inform the user (e.g., 'Equivalent to 5 teaspoons of sugar', 'Contains 3 high-risk additives').
-    3. For 'bad_ingredients', keep the explanation to ONE short, simple sentence that a 10-year-old would understand.
-    4. Suggest 2-3 healthier, whole-food alternatives.
-    """
+# Static health-score bar: plain HTML instead of mounting an animated st.progress component
+SCORE_BAR_TMPL = '<div style="background: #eee; border-radius: 4px;"><div style="width: {percent}%; background: #2E7D32; height: 10px; border-radius: 4px;"></div></div>'
+
+# One Red Flags card (bold name + caption-style explanation), filled per ingredient
+BAD_INGREDIENT_TMPL = '<p><b>{name}</b><br><span style="font-size: 0.875rem; opacity: 0.6;">{explanation}</span></p>'
+
+# One share button; only the link, brand colour and label change between buttons
+SHARE_BTN_TPL = '<a href="{href}" target="_blank" style="flex: 1 1 12rem; padding: 10px 20px; background-color: {color}; color: white; text-align: center; text-decoration: none; border-radius: 8px;">{label}</a>'
+
+APP_URL = "https://your-streamlit-app-url.streamlit.app" # Replace with your actual live URL later
+
+def build_share_links(product: str, score: int, verdict: str, insight: str, app_url: str) -> tuple[str, str]:
+    # Plain function on purpose: one quote() of a short string is cheaper than st.cache_data's hash + pickle
+    share_text = f"🚨 I just scanned {product} with NutriScan AI!\n\n"
+    share_text += f"Score: {score}/10 ({verdict})\n"
+    share_text += f"Shocking fact: {insight}\n\n"
+    share_text += f"Decode your food here: {app_url}"
+    encoded_text = urllib.parse.quote(share_text)
+    return f"https://wa.me/?text={encoded_text}", f"https://twitter.com/intent/tweet?text={encoded_text}"
+
+def run_scan(image_bytes: bytes, mime_type: str):
+    # The Gemini path stays in the full script run; only the dashboard below is a fragment
+    client = get_genai_client(api_key)
+    img_hash = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()  # Cache key for every layer below
     
     with st.status("🔍 AI is analyzing the label...", expanded=True) as status:
         try:
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[prompt, img],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=FoodAnalysis,
-                ),
-            )
-            data = json.loads(response.text)
+            # Per-session copy survives st.cache_data evictions between reruns
+            data = st.session_state.get(f"scan_{img_hash}")
+            if data is None:
+                shown = [None]
+                def show_progress(partial_json):
+                    label = progress_label(partial_json)
+                    if label and label != shown[0]:  # Only send a delta when a new field lands
+                        status.update(label=label)
+                        shown[0] = label
+
+                data = analyze_image(client, img_hash, image_bytes, mime_type, SYSTEM_PROMPT, "FoodAnalysis", MODEL, _on_progress=show_progress)
+                st.session_state[f"scan_{img_hash}"] = data
+                # One collection per Gemini scan instead of one per rerun (runner.postScriptGC = false).
+                # GC itself stays on: it's process-wide and other sessions' scripts run alongside this one.
+                gc.collect()
             status.update(label="Analysis Complete!", state="complete", expanded=False)
-            
-            # --- THE DASHBOARD LAYOUT ---
-            st.divider() 
-            col1, col2 = st.columns([1, 1.2])
-            
-            with col1:
-                st.image(img, use_container_width=True)
-                
-            with col2:
-                st.subheader(f"{data['product_identified']}")
-                
-                if data['health_rating'] >= 7:
-                    st.success(f"**Verdict:** {data['verdict']}")
-                elif data['health_rating'] >= 4:
-                    st.warning(f"**Verdict:** {data['verdict']}")
-                else:
-                    st.error(f"**Verdict:** {data['verdict']}")
-
-                st.write(f"**Health Score:** {data['health_rating']} / 10")
-                st.progress(data['health_rating'] * 10) 
-            
-            st.write("") 
-            
-            st.error("🧠 **AI Insights**")
-            for insight in data['psychological_insights']:
-                st.write(f"▪️ {insight}")
-                
-            st.write("")
-            
-            tab1, tab2, tab3 = st.tabs(["⚠️ Red Flags", "✅ Good Stuff", "💡 Better Choices"])
-            
-            with tab1:
-                if len(data['bad_ingredients']) == 0:
-                    st.write("Looks incredibly clean! No major red flags found.")
-                else:
-                    for item in data['bad_ingredients']:
-                        st.write(f"**{item['name']}**")
-                        st.caption(f"{item['explanation']}")
-                        
-            with tab2:
-                for item in data['good_ingredients']:
-                    st.write(f"- {item}")
-                    
-            with tab3:
-                st.write("**Instead of this, try:**")
-                for item in data['healthy_replacements']:
-                    st.write(f"🍽️ {item}")
-            
-            # --- NEW: THE VIRAL SHARE BUTTONS ---
-            st.divider()
-            st.write("### 📢 Warn your friends!")
-            
-            # 1. Draft the message
-            app_url = "https://your-streamlit-app-url.streamlit.app" # Replace with your actual live URL later
-            share_text = f"🚨 I just scanned {data['product_identified']} with NutriScan AI!\n\n"
-            share_text += f"Score: {data['health_rating']}/10 ({data['verdict']})\n"
-            share_text += f"Shocking fact: {data['psychological_insights'][0]}\n\n"
-            share_text += f"Decode your food here: {app_url}"
-            
-            # 2. Convert text to URL format
-            encoded_text = urllib.parse.quote(share_text)
-            
-            # 3. Create social links
-            whatsapp_url = f"https://wa.me/?text={encoded_text}"
-            twitter_url = f"https://twitter.com/intent/tweet?text={encoded_text}"
-            
-            # 4. Display as nice clickable buttons
-            colA, colB = st.columns(2)
-            with colA:
-                st.markdown(f'<a href="{whatsapp_url}" target="_blank" style="display: inline-block; padding: 10px 20px; background-color: #25D366; color: white; text-align: center; text-decoration: none; border-radius: 8px; width: 100%;">🟢 Share on WhatsApp</a>', unsafe_allow_html=True)
-            with colB:
-                st.markdown(f'<a href="{twitter_url}" target="_blank" style="display: inline-block; padding: 10px 20px; background-color: #1DA1F2; color: white; text-align: center; text-decoration: none; border-radius: 8px; width: 100%;">🐦 Share on X</a>', unsafe_allow_html=True)
-                
+            return data
         except Exception as e:
             status.update(label="Analysis Failed", state="error", expanded=False)
             st.error(f"Something went wrong: {e}")
+            return None
+
+@st.fragment
+def render_dashboard(data, image_bytes: bytes):
+    # Widgets in here only rerun this fragment, never the Gemini path above
+    # --- THE DASHBOARD LAYOUT ---
+    st.divider() 
+    col1, col2 = st.columns([1, 1.2])
+    
+    with col1:
+        st.image(image_bytes, width="stretch")  # Raw bytes: no PIL decode + re-encode for the preview
+        
+    with col2:
+        st.subheader(f"{data.product_identified}")
+        
+        VERDICT_TIERS[data.health_rating](f"**Verdict:** {data.verdict}")
+
+        st.write(f"**Health Score:** {data.health_rating} / 10")
+        st.markdown(SCORE_BAR_TMPL.format(percent=data.health_rating * 10), unsafe_allow_html=True)
+    
+    st.write("") 
+    
+    st.error("🧠 **AI Insights**")
+    # One markdown block per list (hard line breaks) instead of one delta per item
+    st.markdown("  \n".join(f"▪️ {insight}" for insight in data.psychological_insights))
+        
+    st.write("")
+    
+    tab1, tab2, tab3 = st.tabs(["⚠️ Red Flags", "✅ Good Stuff", "💡 Better Choices"])
+    
+    with tab1:
+        if len(data.bad_ingredient_names) == 0:
+            st.write("Looks incredibly clean! No major red flags found.")
+        else:
+            st.markdown("".join(
+                BAD_INGREDIENT_TMPL.format(name=html.escape(name), explanation=html.escape(explanation))
+                # zip_longest: a name the model left unexplained still shows up as a flag
+                for name, explanation in itertools.zip_longest(data.bad_ingredient_names, data.bad_ingredient_explanations, fillvalue="")
+            ), unsafe_allow_html=True)
+                
+    with tab2:
+        st.markdown("\n".join(f"- {item}" for item in data.good_ingredients))
+            
+    with tab3:
+        st.markdown("  \n".join(["**Instead of this, try:**"] + [f"🍽️ {item}" for item in data.healthy_replacements]))
+    
+    # --- NEW: THE VIRAL SHARE BUTTONS ---
+    st.divider()
+    st.write("### 📢 Warn your friends!")
+    
+    # 1-3. Draft the message and turn it into social links
+    # The fragment sits outside run_scan's try/except, so an empty list must not raise here
+    insight = data.psychological_insights[0] if data.psychological_insights else data.verdict
+    whatsapp_url, twitter_url = build_share_links(
+        data.product_identified, data.health_rating, data.verdict, insight, APP_URL
+    )
+    
+    # 4. Display as nice clickable buttons (both in one block, wraps like st.columns on phones)
+    st.markdown(
+        '<div style="display: flex; flex-wrap: wrap; gap: 1rem;">'
+        + SHARE_BTN_TPL.format_map({"href": whatsapp_url, "color": "#25D366", "label": "🟢 Share on WhatsApp"})
+        + SHARE_BTN_TPL.format_map({"href": twitter_url, "color": "#1DA1F2", "label": "🐦 Share on X"})
+        + '</div>',
+        unsafe_allow_html=True,
+    )
+
+if img_src := (uploaded_file or camera_photo):  # Uploads win over the camera, like before
+    image_bytes = img_src.getvalue()
+    data = run_scan(image_bytes, img_src.type or "image/jpeg")
+    if data is not None:
+        render_dashboard(data, image_bytes)
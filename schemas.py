@@ -0,0 +1,31 @@
+# The response blueprints Gemini fills in. These live in their own module so
+# Streamlit builds the Structs and their decoders once per process instead of on every rerun.
+from typing import Annotated
+
+import msgspec
+
+# gc=False: results only hold str/int/list fields, so they can never be part of a reference cycle
+class FoodAnalysis(msgspec.Struct, gc=False):
+    product_identified: str
+    # Constraints land in the schema sent to Gemini, and a violation fails decoding (the UI
+    # indexes by the rating and shares the first insight) instead of crashing the dashboard
+    health_rating: Annotated[int, msgspec.Meta(ge=0, le=10)]
+    verdict: str
+    psychological_insights: Annotated[list[str], msgspec.Meta(min_length=1)]
+    # Parallel lists rather than a list of {name, explanation} objects: the model doesn't
+    # repeat the two keys per ingredient, and parsing builds no per-item objects
+    bad_ingredient_names: list[str]
+    bad_ingredient_explanations: list[str]
+    good_ingredients: list[str]
+    healthy_replacements: list[str]
+
+SCHEMAS = {"FoodAnalysis": FoodAnalysis}
+
+# JSON Schema for each blueprint, generated once at import. Sent as response_json_schema,
+# which the SDK forwards untouched. The Structs are flat, so each one's component is the
+# complete schema and no $ref needs resolving on Gemini's side.
+_, _COMPONENTS = msgspec.json.schema_components(SCHEMAS.values())
+JSON_SCHEMAS = {name: _COMPONENTS[name] for name in SCHEMAS}
+
+# Parse + validate in one C pass. strict=False keeps lax coercion (e.g. "7" -> 7 for health_rating).
+DECODERS = {name: msgspec.json.Decoder(schema, strict=False) for name, schema in SCHEMAS.items()}